@@ -0,0 +1,123 @@
+import time
+import orjson
+from cachetools import TTLCache
+from fastapi import HTTPException, Request, status
+from fastapi.responses import Response
+from loguru import logger
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ..keycloak_api.config import config_keycloak
+from ..keycloak_api.dependencies import is_realm_admin_user, get_keycloak_client, get_token_from_cookie
+from ..keycloak_api.exceptions import NotAccessToken, InvalidToken, AuthError
+from ..keycloak_api.utils import get_token_cache_key, get_unverified_payload
+
+
+FORBIDDEN_BODY = orjson.dumps({"detail": "Доступ запрещен. Требуются права администратора"})
+"""Тело ответа 403 для пользователя без прав администратора"""
+
+_unauthorized_bodies: dict[str, bytes] = {}
+"""Кэш тел ответов 401 по тексту ошибки"""
+
+
+def _unauthorized_response(error: HTTPException) -> Response:
+    """Формирует ответ 401 для известной ошибки авторизации.
+
+    Тело ответа сериализуется один раз для каждой ошибки и дальше берется из кэша.
+
+    Args:
+        error: Исключение HTTPException из модуля keycloak_api.exceptions
+
+    Returns:
+        Response: Ответ со статусом 401
+    """
+    body = _unauthorized_bodies.get(error.detail)
+    if body is None:
+        body = orjson.dumps({"detail": f"Доступ запрещен. Причина: {error.detail}"})
+        _unauthorized_bodies[error.detail] = body
+    return Response(
+        body,
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        media_type="application/json",
+    )
+
+
+class AdminGuard:
+    """ASGI обертка над приложением SQL админки, пропускающая только администраторов realm.
+
+    Устанавливается только на mount админки, поэтому остальные запросы приложения
+    ее не проходят. Результат проверки прав кэшируется по хэшу токена на
+    KEYCLOAK_AUTH_CACHE_TTL секунд (но не дольше срока действия токена).
+
+    Attributes:
+        app: ASGI приложение админки
+        cache: Кэш хэш токена -> (является ли админом, exp токена) или None, если кэш отключен
+    """
+
+    def __init__(self, app: ASGIApp):
+        """Инициализирует обертку.
+
+        Args:
+            app: ASGI приложение админки
+        """
+        self.app = app
+        ttl = config_keycloak.KEYCLOAK_AUTH_CACHE_TTL
+        self.cache = TTLCache(maxsize=4096, ttl=ttl) if ttl > 0 else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """Обрабатывает ASGI вызов."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response = await self.check_permission(Request(scope, receive))
+        if response is None:
+            await self.app(scope, receive, send)
+        else:
+            await response(scope, receive, send)
+
+    async def check_permission(self, request: Request) -> Response | None:
+        """Проверяет, что запрос сделан администратором.
+
+        Args:
+            request: Объект запроса
+
+        Returns:
+            Response | None: Ответ с ошибкой доступа или None, если доступ разрешен
+        """
+        try:
+            token = await get_token_from_cookie(request)
+            if not token:
+                return _unauthorized_response(NotAccessToken)
+            # JWT состоит из трех частей, остальное сразу отклоняем
+            if token.count(".") != 2:
+                return _unauthorized_response(InvalidToken)
+
+            key = get_token_cache_key(token)
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None and time.time() < cached[1] - 5:
+                is_admin = cached[0]
+            else:
+                is_admin = await is_realm_admin_user(
+                    token=token,
+                    keycloak_client=get_keycloak_client(request)
+                )
+                if self.cache is not None:
+                    self.cache[key] = (is_admin, get_unverified_payload(token).get("exp", 0))
+
+            if not is_admin:
+                logger.warning("Попытка войти в зону admin: {}", request.scope["path"])
+                return Response(
+                    FORBIDDEN_BODY,
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    media_type="application/json",
+                )
+            return None
+
+        except HTTPException as e:
+            logger.warning("Ошибка проверки прав: {}", e.detail)
+            return _unauthorized_response(e)
+
+        except Exception:
+            # Подробности ошибки пишем только в лог, клиенту отдаем общую причину
+            logger.opt(exception=True).error("Ошибка проверки прав")
+            return _unauthorized_response(AuthError)
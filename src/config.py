@@ -1,8 +1,13 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import EmailStr, HttpUrl
+from functools import cached_property
 from pathlib import Path
 from loguru import logger
 from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, StrictUndefined, Undefined
+
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates"
+"""Директория шаблонов Jinja2 (вычисляется один раз при импорте)"""
 
 
 class Config(BaseSettings):
@@ -16,6 +21,13 @@ class Config(BaseSettings):
         POSTGRES_DB: Имя базы данных
         POSTGRES_USER: Пользователь БД
         POSTGRES_PASSWORD: Пароль пользователя БД
+        DB_POOL_SIZE: Количество постоянных соединений в пуле
+        DB_MAX_OVERFLOW: Количество дополнительных соединений сверх пула
+        DB_POOL_TIMEOUT: Время ожидания свободного соединения из пула (сек)
+        DB_POOL_RECYCLE: Время жизни соединения до пересоздания (сек)
+        DB_STATEMENT_CACHE_SIZE: Размер кэша подготовленных запросов asyncpg
+        DB_MAX_CONNECTIONS: Количество соединений с БД, доступных всем воркерам приложения
+        REDIS_URL: URL подключения к Redis для кэширования (если не задан, кэш отключен)
         TITLE: Имя проекта
         VERSION: Версия проекта
         DESCRIPTION: Описание проекта (можно использовать синтаксис .md файлов):
@@ -25,13 +37,21 @@ class Config(BaseSettings):
         DOCS_URL: http путь к документации docs
         REDOC_URL: http путь к документации redocs
         ROOT_PATH: http корневой путь проекта
+        WORKERS: Количество процессов uvicorn (если не задано, по числу ядер CPU,
+            но не больше, чем позволяет DB_MAX_CONNECTIONS)
+        STATIC_MAX_AGE: Время кэширования статических файлов браузером (сек)
+        CORS_ORIGINS: Список источников, которым разрешены cross-origin запросы
+        DEBUG: Режим разработки (перезагрузка шаблонов, строгая проверка переменных в шаблонах)
         ROTATION: При каком условии происходит ротация логов
+        RETENTION: Сколько хранятся файлы логов (например, '10 days')
         LEVEL: Уровень логирования
         COMPRESSION: Формат сжатия логов
-        BACKTRACE: Включает подробный трейсбек при ошибках
-        DIAGNOSE: Добавляет информацию о переменных в стектрейс
+        BACKTRACE: Включает подробный трейсбек при ошибках в файле логов
+        DIAGNOSE: Добавляет информацию о переменных в стектрейс файла логов
+            (в лог попадают локальные переменные, включая токены)
         ENQUEUE: Асинхронная запись логов
         CATCH: Перехватывание исключения
+        SERIALIZE: Запись логов в формате JSON
     """
     # Настройки базы данных
     DB_HOST: str
@@ -39,6 +59,15 @@ class Config(BaseSettings):
     POSTGRES_DB: str
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_STATEMENT_CACHE_SIZE: int = 1024
+    DB_MAX_CONNECTIONS: int = 90
+
+    # Настройки Redis
+    REDIS_URL: str | None = None
 
     # Настройка приложения
     TITLE: str = 'FastAPI'
@@ -50,20 +79,26 @@ class Config(BaseSettings):
     DOCS_URL: str | None = None
     REDOC_URL: str | None = None
     ROOT_PATH: str | None = None
+    WORKERS: int | None = None
+    STATIC_MAX_AGE: int = 3600
+    CORS_ORIGINS: list[str] = []
+    DEBUG: bool = False
     ROTATION: str | None = None
+    RETENTION: str | None = None
     LEVEL: str | None = None
     COMPRESSION: str | None = None
     BACKTRACE: bool
-    DIAGNOSE: bool
+    DIAGNOSE: bool = False
     ENQUEUE: bool
     CATCH: bool
+    SERIALIZE: bool = False
 
     model_config = SettingsConfigDict(
         env_file=Path(__file__).parent.parent / ".env",
         env_file_encoding='utf-8'
     )
 
-    @property
+    @cached_property
     def database_url(self) -> str:
         """Генерирует URL для подключения к PostgreSQL с использованием asyncpg."""
         return (f'postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@'
@@ -86,8 +121,15 @@ class Config(BaseSettings):
 
 try:
     config = Config()
+    # Скомпилированные шаблоны кэшируются на диске и переиспользуются между перезапусками воркеров
     templates = Jinja2Templates(
-        directory=Path(__file__).parent.parent / "templates",
+        env=Environment(
+            loader=FileSystemLoader(TEMPLATES_DIR),
+            autoescape=True,
+            auto_reload=config.DEBUG,
+            bytecode_cache=FileSystemBytecodeCache(),
+            undefined=StrictUndefined if config.DEBUG else Undefined,
+        ),
     )
 except Exception as e:
     logger.error(f'Во время парсинга .env произошла ошибка: {e}')
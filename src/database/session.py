@@ -1,9 +1,10 @@
+import time
+import asyncio
 from sqlalchemy import text
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession, AsyncEngine
 from fastapi import Depends
-from typing import Annotated
+from typing import Annotated, Any
 from loguru import logger
-from datetime import datetime
 
 from src.config import config
 from src.keycloak_api.config import config_keycloak
@@ -11,14 +12,63 @@ from src.keycloak_api.config import config_keycloak
 SQL_DATABASE_URL = config.database_url
 SQL_DATABASE_KEYCLOAK_URL = config_keycloak.database_url
 
-engine = create_async_engine(url=SQL_DATABASE_URL)
+engine = create_async_engine(
+    url=SQL_DATABASE_URL,
+    pool_size=config.DB_POOL_SIZE,
+    max_overflow=config.DB_MAX_OVERFLOW,
+    pool_timeout=config.DB_POOL_TIMEOUT,
+    pool_recycle=config.DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+    pool_use_lifo=True,
+    connect_args={
+        "server_settings": {"jit": "off"},
+        "statement_cache_size": config.DB_STATEMENT_CACHE_SIZE,
+    },
+)
 
 session_factory = async_sessionmaker(
     engine,
-    expire_on_commit=False
+    expire_on_commit=False,
+    autoflush=False,
 )
 
 
+WARM_UP_TIMEOUT = 5
+"""Максимальное время прогрева пула соединений при запуске (сек)"""
+
+
+async def warm_up_engine(
+        async_engine: AsyncEngine,
+        connections: int,
+        timeout: float = WARM_UP_TIMEOUT,
+) -> None:
+    """Заранее открывает соединения пула, чтобы первые запросы не ждали подключения к БД.
+
+    Соединения открываются одновременно, поэтому в пуле остается `connections` готовых соединений.
+    При первой ошибке или по истечении `timeout` остальные подключения отменяются, и приложение
+    запускается без прогрева.
+
+    Args:
+        async_engine: Асинхронный движок SQLAlchemy
+        connections: Количество соединений для открытия
+        timeout: Максимальное время прогрева (сек)
+    """
+    async def ping():
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    try:
+        async with asyncio.timeout(timeout):
+            async with asyncio.TaskGroup() as group:
+                for _ in range(connections):
+                    group.create_task(ping())
+        logger.info(f"Пул соединений прогрет: {connections} соединений")
+    except TimeoutError:
+        logger.error(f"Не удалось прогреть пул соединений за {timeout} сек")
+    except Exception as e:
+        logger.error(f"Не удалось прогреть пул соединений: {e!r}")
+
+
 class DatabaseSessionManager:
     """
     Менеджер для управления асинхронными сессиями базы данных.
@@ -40,14 +90,38 @@ class DatabaseSessionManager:
             session_maker: Фабрика для создания асинхронных сессий
         """
         self.session_factory = session_maker
+        self._dependencies: dict[tuple[str | None, bool], Any] = {}
 
     def session_dependency(self, isolation_level: str | None = None, commit: bool = False):
+        """
+        Возвращает зависимость для FastAPI с настраиваемой сессией.
+
+        Зависимость создается один раз для каждой пары (isolation_level, commit) и
+        переиспользуется, поэтому все роуты с одинаковыми параметрами получают один
+        и тот же callable для Depends.
+
+        Args:
+            isolation_level: Уровень изоляции транзакции (например, "SERIALIZABLE")
+            commit: Автоматически коммитить изменения после завершения
+
+        Returns:
+            Annotated[AsyncSession, Depends]: Зависимость для FastAPI
+        """
+        key = (isolation_level, commit)
+        dependency = self._dependencies.get(key)
+        if dependency is None:
+            dependency = self._create_session_dependency(isolation_level, commit)
+            self._dependencies[key] = dependency
+        return dependency
+
+    def _create_session_dependency(self, isolation_level: str | None, commit: bool):
         """
         Создает зависимость для FastAPI с настраиваемой сессией.
 
-        1. Создает новую сессию с указанным уровнем изоляции (если задан)
+        1. Создает новую сессию и открывает транзакцию через session.begin()
+           с указанным уровнем изоляции (если задан)
         2. Предоставляет сессию в качестве зависимости
-        3. Автоматически коммитит или откатывает изменения
+        3. Коммитит транзакцию (если commit=True), иначе или при ошибке откатывает
         4. Гарантирует закрытие сессии
 
         Args:
@@ -59,30 +133,30 @@ class DatabaseSessionManager:
         """
         async def get_session():
             """Генератор сессии для зависимости FastAPI."""
-            start_time = datetime.now()
-            logger.info(f"Создание новой сессии. Изоляция: {isolation_level}, Автокоммит: {commit}")
+            start_ns = time.perf_counter_ns()
 
             async with self.session_factory() as session:
                 try:
-                    if isolation_level:
-                        logger.debug(f"Установка уровня изоляции: {isolation_level}")
-                        await session.execute(
-                            text(f"SET TRANSACTION ISOLATION LEVEL {isolation_level}")
-                        )
-                    yield session
+                    async with session.begin() as transaction:
+                        if isolation_level:
+                            logger.debug("Установка уровня изоляции: {}", isolation_level)
+                            await session.connection(
+                                execution_options={"isolation_level": isolation_level}
+                            )
+                        yield session
+                        if not commit and transaction.is_active:
+                            await transaction.rollback()
                     if commit:
-                        logger.debug("Выполнение коммита изменений")
-                        await session.commit()
-                        logger.info("Изменения успешно закоммичены")
+                        logger.debug("Изменения успешно закоммичены")
                 except Exception as e:
-                    logger.error(f"Ошибка в сессии: {str(e)}", exc_info=True)
-                    await session.rollback()
+                    logger.error("Ошибка в сессии: {}", e)
                     logger.info("Выполнен откат транзакции")
                     raise
                 finally:
-                    await session.close()
-                    exec_time = (datetime.now() - start_time).total_seconds()
-                    logger.info(f"Сессия закрыта. Время выполнения: {exec_time:.2f} сек")
+                    logger.opt(lazy=True).debug(
+                        "Сессия закрыта. Время выполнения: {:.2f} мс",
+                        lambda: (time.perf_counter_ns() - start_ns) / 1_000_000,
+                    )
 
         return Annotated[AsyncSession, Depends(get_session)]
 
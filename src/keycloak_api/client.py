@@ -1,8 +1,25 @@
+import re
+import time
+import asyncio
 import httpx
+import jwt
+import orjson
+from fastapi import HTTPException
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey
 from loguru import logger
+from redis.asyncio import Redis
 
 from .config import config_keycloak
 from .exceptions import TokenRequestError, InvalidToken, KeycloakRequestError
+from .utils import ADMIN_ROLES, cache_admin_role, get_config_public_key, get_payload
+
+PUBLIC_KEYS_TTL = 3600
+"""Время хранения публичных ключей realm, если Keycloak не указал max-age (сек)"""
+
+PUBLIC_KEYS_MIN_REFRESH_INTERVAL = 10
+"""Минимальный интервал между повторными загрузками ключей при неизвестном kid (сек)"""
+
+_MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
 
 
 class KeycloakClient:
@@ -12,20 +29,129 @@ class KeycloakClient:
     получения информации о пользователе.
 
     Attributes:
-        client (httpx.AsyncClient): Асинхронный HTTP-клиент для запросов.
+        client (httpx.AsyncClient): Общий асинхронный HTTP-клиент для запросов.
+        redis (Redis | None): Клиент Redis для кэширования ответов Keycloak.
 
     Methods:
         get_tokens: Обменивает authorization code на токены.
         get_user_info: Получает информацию о пользователе по access_token.
+        get_public_key: Возвращает публичный ключ для проверки подписи токена.
+        decode_token: Декодирует и верифицирует access_token.
     """
-    def __init__(self, client: httpx.AsyncClient | None = None):
+    def __init__(self, client: httpx.AsyncClient, redis: Redis | None = None):
         """Инициализирует KeycloakClient.
 
         Args:
-            client (httpx.AsyncClient | None): Опциональный HTTP-клиент.
-            Если не передан, создается новый экземпляр.
+            client (httpx.AsyncClient): Общий HTTP-клиент приложения (создается в lifespan).
+            redis (Redis | None): Опциональный клиент Redis. Если не передан, кэш не используется.
+        """
+        self.client = client
+        self.redis = redis
+        self._public_keys: dict[str | None, RSAPublicKey] = {}
+        self._public_keys_expiry = 0.0
+        self._public_keys_fetched_at = float("-inf")
+        self._public_keys_lock = asyncio.Lock()
+
+    async def get_public_key(self, kid: str | None = None) -> RSAPublicKey:
+        """Возвращает публичный ключ realm для проверки подписи токена.
+
+        Если задан PUBLIC_KEY_KEYCLOAK, используется он. Иначе ключи загружаются
+        из JWKS realm и кэшируются на время max-age ответа (или PUBLIC_KEYS_TTL).
+        Неизвестный kid (ротация ключей) приводит к принудительной перезагрузке,
+        но не чаще, чем раз в PUBLIC_KEYS_MIN_REFRESH_INTERVAL секунд (в том числе
+        после неудачной загрузки). Если обновить ключи не удалось, ранее загруженный
+        ключ с тем же kid продолжает использоваться.
+
+        Args:
+            kid (str | None): Идентификатор ключа из заголовка токена.
+
+        Returns:
+            RSAPublicKey: Публичный ключ Keycloak.
+
+        Raises:
+            InvalidToken(401): Если ключ с таким kid не найден.
+            KeycloakRequestError(500): Если не удалось загрузить ключи.
+        """
+        if config_keycloak.PUBLIC_KEY_KEYCLOAK:
+            return get_config_public_key()
+
+        key = self._public_keys.get(kid)
+        if key is not None and time.monotonic() < self._public_keys_expiry:
+            return key
+
+        async with self._public_keys_lock:
+            now = time.monotonic()
+            key = self._public_keys.get(kid)
+            if key is not None and now < self._public_keys_expiry:
+                return key
+            if now - self._public_keys_fetched_at < PUBLIC_KEYS_MIN_REFRESH_INTERVAL:
+                if key is not None:
+                    return key
+                logger.error(f'Неизвестный kid токена: {kid}')
+                raise InvalidToken
+            self._public_keys_fetched_at = now
+            try:
+                await self._fetch_public_keys()
+            except HTTPException:
+                if key is None:
+                    raise
+                logger.warning('Не удалось обновить ключи keycloak, используются ранее загруженные')
+                return key
+
+        key = self._public_keys.get(kid)
+        if key is None:
+            logger.error(f'Неизвестный kid токена: {kid}')
+            raise InvalidToken
+        return key
+
+    async def _fetch_public_keys(self) -> None:
+        """Загружает публичные ключи realm (JWKS) и сохраняет их в кэш.
+
+        Raises:
+            KeycloakRequestError(500): Если запрос к Keycloak не удался.
+        """
+        try:
+            response = await self.client.get(config_keycloak.certs_url)
+        except httpx.RequestError as e:
+            logger.error(f'Ошибка при запросе ключей keycloak: {str(e)}')
+            raise KeycloakRequestError
+        if response.status_code != 200:
+            logger.error(f'Не удалось получить ключи keycloak: {response.text}')
+            raise KeycloakRequestError
+
+        keys = {}
+        for jwk_data in orjson.loads(response.content).get("keys", []):
+            # Пропускаем ключи шифрования (RSA-OAEP), нужны только ключи подписи
+            if jwk_data.get("kty") != "RSA" or jwk_data.get("use", "sig") != "sig":
+                continue
+            keys[jwk_data.get("kid")] = jwt.PyJWK(jwk_data).key
+        # Токен без kid проверяется первым ключом для подписи
+        if keys and None not in keys:
+            keys[None] = next(iter(keys.values()))
+
+        max_age = _MAX_AGE_PATTERN.search(response.headers.get("cache-control", ""))
+        ttl = int(max_age.group(1)) if max_age else PUBLIC_KEYS_TTL
+
+        self._public_keys = keys
+        self._public_keys_expiry = time.monotonic() + ttl
+        logger.info(f'Загружено публичных ключей keycloak: {len(self._public_keys)}')
+
+    async def decode_token(self, token: str) -> dict:
+        """Декодирует и верифицирует access_token ключом realm.
+
+        Args:
+            token (str): Access token, полученный от Keycloak.
+
+        Returns:
+            dict: Полезная нагрузка токена (payload).
+
+        Raises:
+            jwt.PyJWTError: Если токен недействителен или истек срок его действия.
+            InvalidToken(401): Если ключ для токена не найден.
+            KeycloakRequestError(500): Если не удалось загрузить ключи.
         """
-        self.client = client or httpx.AsyncClient()
+        kid = jwt.get_unverified_header(token).get("kid")
+        return get_payload(token, await self.get_public_key(kid))
 
     async def get_tokens(self, code: str) -> dict:
         """Обменивает authorization code на токены.
@@ -88,9 +214,12 @@ class KeycloakClient:
             logger.error(f'Ошибка при запросе к keycloak: {str(e)}')
             raise KeycloakRequestError
 
+    @cache_admin_role
     async def check_user_admin_role(self, token: str, user_id: int) -> bool:
         """Проверяет, есть ли у пользователя роль администратора.
 
+        Результат кэшируется в Redis (см. cache_admin_role).
+
         Args:
             token (str): Access token пользователя.
             user_id (int): id пользователя
@@ -100,7 +229,7 @@ class KeycloakClient:
 
         Raises:
             InvalidToken: Если токен недействителен.
-            KeycloakRequestError: Если произошла ошибка запроса.
+            KeycloakRequestError: Если произошла ошибка запроса или Keycloak ответил 5xx.
         """
         headers = {"Authorization": f"Bearer {token}"}
 
@@ -110,18 +239,21 @@ class KeycloakClient:
                 headers=headers
             )
 
-            admin_roles = ['realm-admin']
-
+            # 5xx означает недоступность Keycloak, а не отсутствие роли:
+            # такой ответ не кэшируется, и используется сохраненное значение
+            if response.status_code >= 500:
+                logger.error(f"Keycloak недоступен при получении ролей: {response.status_code}")
+                raise KeycloakRequestError
             if response.status_code != 200:
                 logger.error(f"Ошибка при получении ролей: {response.text}")
                 return False
 
-            roles = response.json()
-            client_roles = []
-            for client_data in roles.get('clientMappings', {}).values():
-                client_roles.extend(role['name'] for role in client_data.get('mappings', []))
-
-            return any(role in admin_roles for role in client_roles)
+            roles = orjson.loads(response.content)
+            return any(
+                role['name'] in ADMIN_ROLES
+                for client_data in roles.get('clientMappings', {}).values()
+                for role in client_data.get('mappings', ())
+            )
 
         except httpx.RequestError as e:
             logger.error(f'Ошибка при запросе к Keycloak: {str(e)}')
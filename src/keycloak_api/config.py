@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from functools import cached_property
 from pathlib import Path
 from loguru import logger
 
@@ -7,7 +8,8 @@ class ConfigKeycloak(BaseSettings):
     """Класс конфигурации для Keycloak и базы данных.
 
     Загружает настройки из файла .env.keycloak или переменных окружения.
-    Предоставляет свойства для формирования URL-адресов.
+    Предоставляет свойства для формирования URL-адресов. URL-адреса вычисляются
+    один раз при первом обращении и дальше берутся из кэша экземпляра.
 
     Attributes:
         DB_HOST: Хост базы данных.
@@ -21,7 +23,8 @@ class ConfigKeycloak(BaseSettings):
         REALM: Название realm в Keycloak.
         CLIENT_ID: Идентификатор клиента в Keycloak.
         KEYCLOAK_EXTERNAL_URL: Внешний URL Keycloak.
-        PUBLIC_KEY_KEYCLOAK: Публичный ключ Keycloak.
+        PUBLIC_KEY_KEYCLOAK: Публичный ключ Keycloak (если не задан, загружается из JWKS realm).
+        KEYCLOAK_AUTH_CACHE_TTL: Время хранения результата проверки прав администратора (сек, 0 - отключено).
 
         database_url: Формирует URL для подключения к PostgreSQL.
         token_url: URL для получения токенов.
@@ -29,8 +32,10 @@ class ConfigKeycloak(BaseSettings):
         auth_url_extend: Внешний URL для аутентификации.
         logout_url: URL для выхода из системы.
         userinfo_url: URL для получения информации о пользователе.
+        certs_url: URL для получения публичных ключей realm (JWKS).
         redirect_uri: URL для перенаправления после аутентификации.
         keycloak_url: Полный URL для аутентификации в Keycloak.
+        user_roles_url_template: Шаблон URL для получения ролей пользователя.
         get_user_roles_url: Возвращает URL для получения ролей пользователя в Keycloak.
     """
     # Настройки базы данных
@@ -48,6 +53,7 @@ class ConfigKeycloak(BaseSettings):
     CLIENT_ID: str | None = None
     KEYCLOAK_EXTERNAL_URL: str
     PUBLIC_KEY_KEYCLOAK: str | None = None
+    KEYCLOAK_AUTH_CACHE_TTL: int = 60
 
     model_config = SettingsConfigDict(
         env_file=Path(__file__).parent.parent.parent / ".env.keycloak",
@@ -55,43 +61,48 @@ class ConfigKeycloak(BaseSettings):
         extra='allow'
     )
 
-    @property
+    @cached_property
     def database_url(self) -> str:
         """Формирует URL для подключения к PostgreSQL с использованием asyncpg."""
         return (f'postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@'
                 f'{self.DB_HOST}:{self.DB_PORT}/{self.POSTGRES_DB}')
 
-    @property
+    @cached_property
     def token_url(self) -> str:
         """Формирует URL для получения токенов в Keycloak."""
         return f"{self.KEYCLOAK_BASE_URL}/realms/{self.REALM}/protocol/openid-connect/token"
 
-    @property
+    @cached_property
     def auth_url(self) -> str:
         """Формирует URL для аутентификации в Keycloak."""
         return f"{self.KEYCLOAK_BASE_URL}/realms/{self.REALM}/protocol/openid-connect/auth"
 
-    @property
+    @cached_property
     def auth_url_extend(self) -> str:
         """Формирует внешний URL для аутентификации в Keycloak."""
         return f"{self.KEYCLOAK_EXTERNAL_URL}/realms/{self.REALM}/protocol/openid-connect/auth"
 
-    @property
+    @cached_property
     def logout_url(self) -> str:
         """Формирует URL для выхода из системы в Keycloak."""
         return f"{self.KEYCLOAK_EXTERNAL_URL}/realms/{self.REALM}/protocol/openid-connect/logout"
 
-    @property
+    @cached_property
     def userinfo_url(self) -> str:
         """Формирует URL для получения информации о пользователе."""
         return f"{self.KEYCLOAK_BASE_URL}/realms/{self.REALM}/protocol/openid-connect/userinfo"
 
-    @property
+    @cached_property
+    def certs_url(self) -> str:
+        """Формирует URL для получения публичных ключей realm (JWKS)."""
+        return f"{self.KEYCLOAK_BASE_URL}/realms/{self.REALM}/protocol/openid-connect/certs"
+
+    @cached_property
     def redirect_uri(self) -> str:
         """Формирует URL для перенаправления после аутентификации. (Куда будет кидать запрос keycloak)"""
         return f"{self.BASE_URL}/keycloak/login/callback"
 
-    @property
+    @cached_property
     def keycloak_url(self) -> str:
         """Формирует полный URL для аутентификации в Keycloak."""
         return (
@@ -102,6 +113,11 @@ class ConfigKeycloak(BaseSettings):
             f"&redirect_uri={self.redirect_uri}"
         )
 
+    @cached_property
+    def user_roles_url_template(self) -> str:
+        """Формирует шаблон URL для получения ролей пользователя в Keycloak (%s - ID пользователя)."""
+        return f"{self.KEYCLOAK_BASE_URL}/admin/realms/{self.REALM}/users/%s/role-mappings"
+
     def get_user_roles_url(self, user_id: int) -> str:
         """Возвращает URL для получения ролей пользователя в Keycloak.
 
@@ -111,7 +127,7 @@ class ConfigKeycloak(BaseSettings):
         Returns:
             str: Полный URL для запроса ролей пользователя.
         """
-        return f"{self.KEYCLOAK_BASE_URL}/admin/realms/{self.REALM}/users/{user_id}/role-mappings"
+        return self.user_roles_url_template % user_id
 
 
 try:
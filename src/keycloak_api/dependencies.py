@@ -1,11 +1,20 @@
+import time
+import asyncio
 from fastapi import Depends, Request, HTTPException, status
+from cachetools import TTLCache
 from loguru import logger
 
 from .client import KeycloakClient
 from .exceptions import NotAccessToken, InvalidToken
-from .utils import get_payload
+from .utils import get_token_cache_key, get_unverified_payload, has_admin_role
 from .schemas import AddUser
 
+USER_INFO_CACHE_TTL = 30
+"""Время хранения ответа userinfo от Keycloak в кэше (сек)"""
+
+_user_info_cache: TTLCache = TTLCache(maxsize=10_000, ttl=USER_INFO_CACHE_TTL)
+"""Кэш хэш токена -> (ответ userinfo, exp токена)"""
+
 
 def get_keycloak_client(request: Request) -> KeycloakClient:
     """Возвращает клиент Keycloak из состояния приложения.
@@ -33,11 +42,13 @@ async def get_token_from_cookie(request: Request) -> str | None:
 
 async def get_cookie_user(
     token: str = Depends(get_token_from_cookie),
+    keycloak_client: KeycloakClient = Depends(get_keycloak_client),
 ) -> AddUser:
     """Получает информацию о пользователе из токена в cookie.
 
     Args:
         token (str): Access token, полученный из cookie.
+        keycloak_client (KeycloakClient): Клиент Keycloak.
 
     Returns:
         AddUser: Объект с информацией о пользователе.
@@ -50,7 +61,7 @@ async def get_cookie_user(
         raise NotAccessToken
 
     try:
-        user_info = await get_payload(token)
+        user_info = await keycloak_client.decode_token(token)
         user_info["id"] = user_info.pop("sub")
         return AddUser(**user_info)
     except Exception as e:
@@ -64,6 +75,9 @@ async def get_server_user(
 ) -> dict:
     """Получает информацию о пользователе от сервера Keycloak.
 
+    Ответ кэшируется по токену на USER_INFO_CACHE_TTL секунд (но не дольше срока
+    действия токена), чтобы не обращаться к Keycloak на каждый запрос.
+
     Args:
         token (str): Access token, полученный из cookie.
         keycloak_client (KeycloakClient): Клиент Keycloak.
@@ -78,9 +92,16 @@ async def get_server_user(
     if not token:
         raise NotAccessToken
 
+    key = get_token_cache_key(token)
+    cached = _user_info_cache.get(key)
+    if cached is not None and time.time() < cached[1]:
+        return dict(cached[0])
+
     try:
         user_info = await keycloak_client.get_user_info(token)
-        return user_info
+        # Keycloak уже принял токен, поэтому exp можно взять без проверки подписи
+        _user_info_cache[key] = (user_info, get_unverified_payload(token).get("exp", 0))
+        return dict(user_info)
     except Exception as e:
         logger.error(f'Проблема токена: {e}')
         raise InvalidToken
@@ -92,6 +113,9 @@ async def is_realm_admin_user(
 ) -> bool:
     """Проверяет, есть ли у пользователя роль администратора.
 
+    Роль ищется в claim resource_access проверенного токена. Если роли администратора
+    в токене нет, роли запрашиваются у Keycloak.
+
     Args:
         token (str): Access token пользователя.
         keycloak_client (KeycloakClient): Клиент Keycloak.
@@ -107,9 +131,18 @@ async def is_realm_admin_user(
         raise NotAccessToken
 
     try:
-        user_info = await keycloak_client.get_user_info(token)
-        logger.info(f'Пользователь f{user_info["sub"]}, пытается получить доступ')
-        is_admin = await keycloak_client.check_user_admin_role(token, user_info["sub"])
+        payload = await keycloak_client.decode_token(token)
+        user_id = payload["sub"]
+        logger.info(f'Пользователь {user_id}, пытается получить доступ')
+
+        # Роль администратора, выданная в токене, проверяется локально без запроса к Keycloak
+        if has_admin_role(payload):
+            return True
+
+        _, is_admin = await asyncio.gather(
+            keycloak_client.get_user_info(token),
+            keycloak_client.check_user_admin_role(token, user_id),
+        )
         return is_admin
     except Exception as e:
         logger.error(f'Проблема токена: {e}')
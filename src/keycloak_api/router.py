@@ -11,10 +11,13 @@ from .dependencies import get_keycloak_client
 from .services import UserService
 from .schemas import AddUser
 from .config import config_keycloak
-from .utils import get_payload
+from .utils import get_unverified_payload
 
 keycloak_router = APIRouter(prefix="/keycloak", tags=["keycloak"])
 
+ACCESS_TOKEN_COOKIE_ATTRIBUTES = b"; HttpOnly; Path=/; SameSite=lax; Secure"
+"""Неизменяемая часть заголовка Set-Cookie для access токена"""
+
 
 @keycloak_router.get(
     "/login/callback",
@@ -74,26 +77,20 @@ async def login_callback(
             logger.error(f'Нету access token')
             raise NotAccessToken
 
-        user_info = await get_payload(access_token)
+        # Токен только что получен от Keycloak напрямую, повторная проверка подписи не нужна
+        user_info = get_unverified_payload(access_token)
         user_id = user_info.get('sub')
         if not user_id:
             logger.error(f'Не нашелся ID пользователя {user_id}')
             raise NotFoundUserIdError
 
-        user = await UserService.find_by_id(session, user_id)
-        if not user and isinstance(user_info, dict):
-            user_info["id"] = user_info.pop("sub")
-            logger.info('Создал юзера')
-            await UserService.add(session, AddUser(**user_info))
+        user_info["id"] = user_info.pop("sub")
+        await UserService.upsert(session, AddUser(**user_info))
 
         response = RedirectResponse(url="/protected")
-        response.set_cookie(
-            key="access_token",
-            value=access_token,
-            httponly=True,
-            secure=True,
-            samesite="lax",
-            path="/",
+        # Заголовок собирается напрямую: меняется только значение токена
+        response.raw_headers.append(
+            (b"set-cookie", b"access_token=" + access_token.encode() + ACCESS_TOKEN_COOKIE_ATTRIBUTES)
         )
         logger.info(f"Юзер {user_id} вошел успешно в систему")
         return response
@@ -1,7 +1,49 @@
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+from loguru import logger
+
 from ..database.service import BaseService
 from .models import User
+from .schemas import AddUser
 
 
 class UserService(BaseService):
     """Сервис для работы с моделью User в БД"""
     model = User
+
+    @classmethod
+    async def upsert(cls, session: AsyncSession, values: AddUser) -> User | None:
+        """Создает пользователя, если его еще нет, одним запросом INSERT ... ON CONFLICT DO NOTHING.
+
+        Существующий пользователь повторно не запрашивается, поэтому запрос к БД всегда один.
+
+        Args:
+            session: Асинхронная сессия SQLAlchemy
+            values: Pydantic модель с данными пользователя
+
+        Returns:
+            User | None: Созданный пользователь или None, если пользователь уже существует
+
+        Raises:
+            SQLAlchemyError: При ошибках работы с базой данных
+        """
+        values_dict = values.model_dump(exclude_unset=True)
+        logger.info(f"Добавление пользователя {values.id}, если он не существует")
+        try:
+            query = (
+                insert(cls.model)
+                .values(**values_dict)
+                .on_conflict_do_nothing(index_elements=[cls.model.id])
+                .returning(cls.model)
+            )
+            result = await session.execute(query)
+            user = result.scalar_one_or_none()
+            if user is None:
+                logger.info(f"Пользователь {values.id} уже существует")
+                return None
+            logger.info(f"Пользователь {values.id} успешно добавлен")
+            return user
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при добавлении пользователя: {e}")
+            raise e
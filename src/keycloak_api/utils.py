@@ -1,42 +1,184 @@
-from jose import jwt
+import jwt
+import time
+import hashlib
+from functools import lru_cache, wraps
+from cachetools import TTLCache
+from fastapi import HTTPException
+from loguru import logger
+from redis.exceptions import RedisError
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey
 
 from .config import config_keycloak
 
+ADMIN_ROLES = frozenset(("realm-admin",))
+"""Клиентские роли Keycloak, дающие права администратора"""
 
-def get_public_key() -> str:
-    """Формирует публичный ключ Keycloak в PEM-формате.
+PAYLOAD_CACHE_TTL = 60
+"""Максимальное время хранения проверенного payload в кэше (сек)"""
+
+_payload_cache: TTLCache = TTLCache(maxsize=10_000, ttl=PAYLOAD_CACHE_TTL)
+
+ADMIN_ROLE_CACHE_TTL = 30
+"""Время хранения результата проверки роли администратора в Redis (сек)"""
+
+ADMIN_ROLE_STALE_TTL = 600
+"""Время хранения последнего известного результата на случай недоступности Keycloak (сек)"""
+
+
+@lru_cache(maxsize=1)
+def get_config_public_key() -> RSAPublicKey:
+    """Загружает публичный ключ Keycloak из PEM-формата (PUBLIC_KEY_KEYCLOAK).
+
+    Ключ парсится один раз и кэшируется, чтобы не разбирать PEM на каждый запрос.
 
     Возвращает:
-        str: Публичный ключ в формате PEM с заголовками.
+        RSAPublicKey: Публичный ключ Keycloak.
     """
-    return (
+    pem = (
         f"-----BEGIN PUBLIC KEY-----\n"
         f"{config_keycloak.PUBLIC_KEY_KEYCLOAK}"
         f"\n-----END PUBLIC KEY-----"
     )
+    return serialization.load_pem_public_key(pem.encode())
 
 
-async def get_payload(token) -> dict:
+def get_token_cache_key(token: str) -> bytes:
+    """Формирует ключ кэша для токена, чтобы не хранить сами токены в памяти.
+
+    Args:
+        token (str): JWT-токен.
+
+    Returns:
+        bytes: Хэш токена.
+    """
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+def get_payload(token: str, public_key: RSAPublicKey) -> dict:
     """Декодирует и верифицирует JWT-токен.
 
+    Проверенный payload кэшируется по токену до истечения его срока действия
+    (но не дольше PAYLOAD_CACHE_TTL), поэтому повторные запросы с тем же
+    токеном не проверяют подпись заново.
+
     Args:
         token (str): JWT-токен для декодирования.
+        public_key (RSAPublicKey): Публичный ключ Keycloak (см. KeycloakClient.get_public_key).
 
     Returns:
         dict: Полезная нагрузка токена (payload).
 
     Raises:
-        jwt.JWTError: Если токен недействителен или истек срок его действия.
+        jwt.PyJWTError: Если токен недействителен или истек срок его действия.
     """
-    public_key = get_public_key()
+    key = get_token_cache_key(token)
+    payload = _payload_cache.get(key)
+    if payload is not None and payload.get("exp", 0) > time.time():
+        return dict(payload)
 
-    return jwt.decode(
+    payload = jwt.decode(
         token,
         public_key,
         algorithms=["RS256"],
-        options={
-            "verify_signature": True,
-            "verify_aud": False,
-            "verify_exp": True
-        }
+        options={"verify_aud": False},
     )
+    _payload_cache[key] = payload
+    return dict(payload)
+
+
+def get_unverified_payload(token: str) -> dict:
+    """Декодирует JWT-токен без проверки подписи.
+
+    Использовать только для токенов, полученных напрямую от Keycloak по защищенному
+    каналу (например, в ответе token endpoint). Токены от клиента проверяются через get_payload.
+
+    Args:
+        token (str): JWT-токен для декодирования.
+
+    Returns:
+        dict: Полезная нагрузка токена (payload).
+
+    Raises:
+        jwt.PyJWTError: Если токен имеет неверный формат.
+    """
+    return jwt.decode(token, options={"verify_signature": False})
+
+
+def has_admin_role(payload: dict) -> bool | None:
+    """Проверяет наличие роли администратора по claim resource_access токена.
+
+    Отсутствие роли в токене ничего не доказывает: клиент может не включать роли
+    realm-management в токены (например, при выключенном "Full scope allowed").
+    Поэтому доверяем только найденной роли.
+
+    Args:
+        payload (dict): Проверенная полезная нагрузка access токена.
+
+    Returns:
+        bool | None: True, если токен содержит роль администратора,
+        None, если роли в токене нет и нужно спросить Keycloak.
+    """
+    resource_access = payload.get("resource_access") or {}
+    for client_data in resource_access.values():
+        for role in client_data.get("roles", ()):
+            if role in ADMIN_ROLES:
+                return True
+    return None
+
+
+def cache_admin_role(func):
+    """Декоратор, кэширующий в Redis результат проверки роли администратора.
+
+    Результат хранится ADMIN_ROLE_CACHE_TTL секунд по ключу (хэш токена, ID пользователя).
+    Дополнительно хранится последнее известное значение на ADMIN_ROLE_STALE_TTL секунд:
+    оно отдается, если Keycloak недоступен (метод выбросил HTTPException, например
+    при сетевой ошибке или ответе 5xx). В кэш попадают только полученные ответы.
+    Если Redis не подключен или недоступен, проверка выполняется напрямую.
+
+    Args:
+        func: Метод KeycloakClient вида (self, token, user_id) -> bool.
+
+    Returns:
+        Обернутый метод с кэшированием.
+    """
+    @wraps(func)
+    async def wrapper(self, token: str, user_id) -> bool:
+        redis = self.redis
+        if redis is None:
+            return await func(self, token, user_id)
+
+        key = f"kc:admin:{get_token_cache_key(token).hex()}:{user_id}"
+        stale_key = f"{key}:stale"
+        try:
+            cached = await redis.get(key)
+        except RedisError as e:
+            logger.warning(f"Redis недоступен, проверка роли без кэша: {e}")
+            return await func(self, token, user_id)
+        if cached is not None:
+            return cached == b"1"
+
+        try:
+            is_admin = await func(self, token, user_id)
+        except HTTPException:
+            # Keycloak недоступен: отдаем последнее известное значение, если оно есть
+            try:
+                stale = await redis.get(stale_key)
+            except RedisError:
+                stale = None
+            if stale is None:
+                raise
+            logger.warning(f"Keycloak недоступен, используется сохраненная роль пользователя {user_id}")
+            return stale == b"1"
+
+        value = b"1" if is_admin else b"0"
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.set(key, value, ex=ADMIN_ROLE_CACHE_TTL)
+                pipe.set(stale_key, value, ex=ADMIN_ROLE_STALE_TTL)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Не удалось сохранить роль в Redis: {e}")
+        return is_admin
+
+    return wrapper
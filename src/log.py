@@ -1,3 +1,5 @@
+import os
+import sys
 import logging
 from loguru import logger
 from pathlib import Path
@@ -60,13 +62,32 @@ def setup_logger():
         logging_logger.handlers = []
         logging_logger.propagate = True
 
+    # Заменяем стандартный синхронный вывод loguru в stderr на вывод через очередь,
+    # чтобы запись логов не блокировала event loop. Трейсбеки в stderr выводятся без
+    # значений переменных: в них могут оказаться токены из обработки запросов
+    logger.remove()
     logger.add(
-        Path(__file__).parent.parent / "app.log",
+        sys.stderr,
+        level=config.LEVEL,
+        backtrace=False,
+        diagnose=False,
+        enqueue=config.ENQUEUE,
+        catch=config.CATCH,
+        serialize=config.SERIALIZE,
+    )
+
+    # Каждый воркер пишет в свой файл: ротация loguru не рассчитана на несколько процессов.
+    # Время запуска и pid находятся внутри {time}, поэтому retention loguru (glob app.*.log)
+    # удаляет и старые файлы завершившихся воркеров
+    logger.add(
+        Path(__file__).parent.parent / f"app.{{time:YYYY-MM-DD_HH-mm-ss_{os.getpid()}}}.log",
         rotation=config.ROTATION,
+        retention=config.RETENTION,
         level=config.LEVEL,
         backtrace=config.BACKTRACE,
         diagnose=config.DIAGNOSE,
         enqueue=config.ENQUEUE,
         catch=config.CATCH,
         compression=config.COMPRESSION,
+        serialize=config.SERIALIZE,
     )
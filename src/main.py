@@ -1,44 +1,97 @@
+import os
 import uvicorn
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request, status
-from fastapi.responses import RedirectResponse, JSONResponse
+from fastapi.responses import RedirectResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from starlette.routing import Mount
 from loguru import logger
 from pathlib import Path
 import httpx
-from sqladmin import Admin
-from typing import Callable
+from redis.asyncio import Redis
 
 from src.log import setup_logger
 from src.config import config
-from src.database.session import engine
+from src.database.session import engine, warm_up_engine
 from src.keycloak_api.client import KeycloakClient
 from src.keycloak_api.router import keycloak_router
 from src.keycloak_api.config import config_keycloak
-from src.keycloak_api.dependencies import is_realm_admin_user, get_keycloak_client, get_token_from_cookie
 from src.router import router
-from src.admin.models import UserAdmin
+from src.utils import CachedStaticFiles, PathExcludingGZipMiddleware
+from src.admin.middleware import AdminGuard
+
+STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
+"""Директория статических файлов (вычисляется один раз при импорте)"""
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Цикл жизни приложения FastAPI."""
     # Создаем и сохраняем shared httpx клиент
-    http_client = httpx.AsyncClient()
-    app.state.keycloak_client = KeycloakClient(http_client)
+    http_client = httpx.AsyncClient(
+        timeout=httpx.Timeout(5.0, connect=2.0),
+        transport=httpx.AsyncHTTPTransport(
+            # HTTP/2 согласуется только по TLS (ALPN): при http:// адресе Keycloak
+            # запросы идут по HTTP/1.1 через пул keep-alive соединений
+            http2=True,
+            # keepalive_expiry меньше idle timeout Keycloak, чтобы не переиспользовать закрытые соединения
+            limits=httpx.Limits(
+                max_connections=200,
+                max_keepalive_connections=100,
+                keepalive_expiry=30.0,
+            ),
+            retries=1,
+        ),
+    )
+    # Подключаем Redis для кэширования ответов Keycloak (если настроен).
+    # Короткие таймауты нужны, чтобы при зависшем Redis проверка прав сразу шла без кэша
+    redis = Redis.from_url(
+        config.REDIS_URL,
+        socket_connect_timeout=0.5,
+        socket_timeout=0.5,
+    ) if config.REDIS_URL else None
+    app.state.redis = redis
+    app.state.keycloak_client = KeycloakClient(http_client, redis)
+
+    # Прогреваем пул соединений с БД
+    await warm_up_engine(engine, config.DB_POOL_SIZE)
 
     yield
 
-    # Закрываем httpx клиент при прекращении работы приложения
+    # Закрываем httpx и Redis клиенты при прекращении работы приложения
     await http_client.aclose()
+    if redis is not None:
+        await redis.aclose()
+
+
+async def redirect_to_keycloak(request: Request, exc: HTTPException) -> RedirectResponse:
+    """В случае любой ошибки со статусом 401(Unauthorized) выкидывает в keycloak"""
+    return RedirectResponse(
+        request.app.state.keycloak_login_url,
+        status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+    )
 
 
 def create_sql_admin_panel(app: FastAPI):
-    """Создаем SQL админку и добавляем ей view-ы"""
+    """Создаем SQL админку, добавляем ей view-ы и закрываем ее проверкой прав администратора"""
+    # sqladmin импортируется только при создании приложения, а не при импорте модуля
+    from sqladmin import Admin
+    from src.admin.models import UserAdmin
+
     admin = Admin(app, engine)
     admin.add_view(UserAdmin)
 
+    # Проверка прав выполняется только для запросов, попавших в mount админки
+    guarded = False
+    for route in app.router.routes:
+        if isinstance(route, Mount) and route.app is admin.admin:
+            route.app = AdminGuard(route.app)
+            guarded = True
+
+    # Без найденного mount админка осталась бы открытой, поэтому приложение не запускаем
+    if not guarded:
+        raise RuntimeError("Не найден mount SQL админки для проверки прав администратора")
+
 
 def create_app() -> FastAPI:
     """Фабрика для создания и настройки экземпляра FastAPI приложения.
@@ -46,6 +99,9 @@ def create_app() -> FastAPI:
     Returns:
         FastAPI: Настроенный экземпляр FastAPI приложения
     """
+    # Настройки логирования (выполняются в каждом воркере)
+    setup_logger()
+
     # Создаем экземпляр приложения
     app = FastAPI(
         title=config.TITLE,
@@ -56,57 +112,32 @@ def create_app() -> FastAPI:
         redoc_url=config.REDOC_URL,
         root_path=config.ROOT_PATH,
         lifespan=lifespan,
+        default_response_class=ORJSONResponse,
+    )
+
+    # URL входа в Keycloak не меняется во время работы, вычисляем его один раз
+    app.state.keycloak_login_url = config_keycloak.keycloak_url
+
+    # Добавляем middleware сжатия (добавляется раньше CORS, чтобы оказаться под ним в цепочке).
+    # Статика не сжимается: изображения и шрифты уже сжаты
+    app.add_middleware(
+        PathExcludingGZipMiddleware,
+        exclude_prefixes=("/static/",),
+        minimum_size=512,
+        compresslevel=5,
     )
 
     # Добавляем middleware CORS
     app.add_middleware(
         CORSMiddleware,
-        allow_origins=["*"],
+        allow_origins=config.CORS_ORIGINS,
         allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"]
+        allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
+        allow_headers=["Authorization", "Content-Type"]
     )
 
-
-    # Регистрируем middleware admin
-    @app.middleware("http")
-    async def admin_permission_middleware(request: Request, call_next: Callable):
-        # Пропускаем запросы не к /admin
-        if not request.url.path.startswith("/admin"):
-            return await call_next(request)
-
-        try:
-            token = await get_token_from_cookie(request)
-            keycloak_client = get_keycloak_client(request)
-            is_admin = await is_realm_admin_user(
-                token=token,
-                keycloak_client=keycloak_client
-            )
-
-            if not is_admin:
-                logger.warning(f"Попытка войти в зону admin")
-                return JSONResponse(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    content={"detail": "Доступ запрещен. Требуются права администратора"}
-                )
-
-            return await call_next(request)
-
-        except Exception as e:
-            logger.error(f"Ошибка проверки прав: {str(e)}")
-            return JSONResponse(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                content={"detail": f"Доступ запрещен. Причина: {str(e)}"}
-            )
-
-
-    # Регистрируем обработчик исключений
-    @app.exception_handler(HTTPException)
-    async def auth_exception_handler(request: Request, exc: HTTPException):
-        """В случае любой ошибки со статусом 401(Unauthorized) выкидывает в keycloak"""
-        if exc.status_code == 401:
-            return RedirectResponse(config_keycloak.keycloak_url)
-        raise exc
+    # Регистрируем обработчик исключений только для статуса 401
+    app.add_exception_handler(status.HTTP_401_UNAUTHORIZED, redirect_to_keycloak)
 
     # Создаем sql админку
     create_sql_admin_panel(app)
@@ -114,21 +145,80 @@ def create_app() -> FastAPI:
     # Подключаем роуты и статические файлы
     app.include_router(keycloak_router)
     app.include_router(router)
-    app.mount("/static", StaticFiles(directory=Path(__file__).parent.parent / 'static'), name="static")
+    app.mount(
+        "/static",
+        CachedStaticFiles(directory=STATIC_DIR, check_dir=False, max_age=config.STATIC_MAX_AGE),
+        name="static",
+    )
 
     return app
 
 
-if __name__ == '__main__':
+def get_server_implementations() -> tuple[str, str]:
+    """Выбирает реализации event loop и HTTP парсера для uvicorn.
+
+    Используются uvloop и httptools, если они установлены (на Windows uvloop недоступен),
+    иначе стандартные asyncio и h11.
+
+    Returns:
+        tuple[str, str]: Значения параметров loop и http для uvicorn.run
+    """
     try:
-        setup_logger()  # Настройки логирования
-        logger.info('Создаю приложение FastAPI')
-        app = create_app()
+        import uvloop  # noqa: F401
+        loop = "uvloop"
+    except ImportError:
+        loop = "asyncio"
+
+    try:
+        import httptools  # noqa: F401
+        http = "httptools"
+    except ImportError:
+        http = "h11"
+
+    return loop, http
+
+
+def get_workers_count() -> int:
+    """Определяет количество процессов uvicorn.
+
+    Каждый воркер держит свой пул соединений с БД размером до DB_POOL_SIZE + DB_MAX_OVERFLOW,
+    поэтому суммарно воркеры не должны превышать DB_MAX_CONNECTIONS. Если WORKERS не задан,
+    используется число ядер CPU, ограниченное этим лимитом.
+
+    Returns:
+        int: Количество воркеров
+
+    Raises:
+        ValueError: Если заданное WORKERS не помещается в DB_MAX_CONNECTIONS
+    """
+    connections_per_worker = config.DB_POOL_SIZE + config.DB_MAX_OVERFLOW
+    max_workers = max(1, config.DB_MAX_CONNECTIONS // connections_per_worker)
 
+    if config.WORKERS is None:
+        return min(os.cpu_count() or 1, max_workers)
+
+    if config.WORKERS * connections_per_worker > config.DB_MAX_CONNECTIONS:
+        raise ValueError(
+            f"WORKERS={config.WORKERS} требует {config.WORKERS * connections_per_worker} соединений с БД, "
+            f"а доступно DB_MAX_CONNECTIONS={config.DB_MAX_CONNECTIONS}"
+        )
+    return config.WORKERS
+
+
+if __name__ == '__main__':
+    try:
+        logger.info('Запускаю приложение FastAPI')
+        loop, http = get_server_implementations()
+        # Приложение передается строкой импорта фабрики: каждый воркер сам вызывает
+        # create_app и в lifespan создает свои пул соединений с БД и httpx клиент
         uvicorn.run(
-            app,
+            "src.main:create_app",
+            factory=True,
             host="0.0.0.0",
             port=5000,
+            workers=get_workers_count(),
+            loop=loop,
+            http=http,
             log_config=None,
             log_level=None,
         )
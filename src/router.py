@@ -1,20 +1,21 @@
-from fastapi import APIRouter, Depends, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import APIRouter, Depends, Request, status
+from fastapi.responses import HTMLResponse, ORJSONResponse, RedirectResponse
 
 from src.keycloak_api.dependencies import get_cookie_user, get_server_user
-from src.keycloak_api.config import config_keycloak
 from src.config import templates
 
 router = APIRouter()
 
 
 @router.get("/")
-async def index():
-    return RedirectResponse(config_keycloak.keycloak_url)
+async def index(request: Request):
+    # URL входа вычисляется один раз в create_app
+    return RedirectResponse(request.app.state.keycloak_login_url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
 
 
-@router.get("/protected")
+@router.get("/protected", response_model=None, response_class=ORJSONResponse)
 async def protected_page(
         user: dict = Depends(get_server_user)
-):
-    return user
+) -> ORJSONResponse:
+    # userinfo от Keycloak уже состоит из JSON-типов, jsonable_encoder не нужен
+    return ORJSONResponse(user)
@@ -1,4 +1,9 @@
+import os
 from fastapi import HTTPException, status
+from fastapi.staticfiles import StaticFiles
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 
 def ok_response_docs(
@@ -66,3 +71,62 @@ def tag_metadata(
         "name": tag,
         "description": description,
     }
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles, добавляющий заголовок Cache-Control к ответам со статикой.
+
+    Attributes:
+        cache_control: Значение заголовка Cache-Control
+    """
+
+    def __init__(self, *args, max_age: int = 3600, **kwargs):
+        """Инициализирует раздачу статики.
+
+        Args:
+            max_age: Время кэширования файлов браузером (сек)
+        """
+        super().__init__(*args, **kwargs)
+        self.cache_control = f"public, max-age={max_age}"
+
+    def file_response(
+            self,
+            full_path: str | os.PathLike,
+            stat_result: os.stat_result,
+            scope: Scope,
+            status_code: int = status.HTTP_200_OK,
+    ) -> Response:
+        """Формирует ответ с файлом и добавляет заголовок Cache-Control."""
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["Cache-Control"] = self.cache_control
+        return response
+
+
+class PathExcludingGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware, не сжимающий ответы по заданным префиксам пути.
+
+    Нужен для статики: изображения и шрифты (png, jpeg, woff2) уже сжаты, но
+    отдаются без Content-Encoding, и обычный GZipMiddleware сжимает их повторно.
+
+    Attributes:
+        exclude_prefixes: Префиксы пути, ответы по которым не сжимаются
+    """
+
+    def __init__(self, app: ASGIApp, exclude_prefixes: tuple[str, ...] = (), **kwargs):
+        """Инициализирует middleware.
+
+        Args:
+            app: ASGI приложение
+            exclude_prefixes: Префиксы пути, ответы по которым не сжимаются
+        """
+        super().__init__(app, **kwargs)
+        self.exclude_prefixes = exclude_prefixes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """Обрабатывает ASGI вызов."""
+        if scope["type"] == "http":
+            path = scope["path"].removeprefix(scope.get("root_path", ""))
+            if path.startswith(self.exclude_prefixes):
+                await self.app(scope, receive, send)
+                return
+        await super().__call__(scope, receive, send)